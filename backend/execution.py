@@ -0,0 +1,168 @@
+import asyncio
+import os
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+
+EXECUTION_TIMEOUT = 5.0
+# Cap on stdout/stderr kept per run; the rest is read and discarded
+MAX_OUTPUT_SIZE = int(os.getenv("EXECUTION_MAX_OUTPUT_SIZE", "65536"))
+# Number of rooms whose last execution result is kept in memory
+LAST_RESULT_ROOMS = int(os.getenv("EXECUTION_LAST_RESULT_ROOMS", "1000"))
+TRUNCATED_MARKER = "\n... output truncated"
+
+
+def truncate_output(text):
+    if len(text) <= MAX_OUTPUT_SIZE:
+        return text
+    return text[:MAX_OUTPUT_SIZE] + TRUNCATED_MARKER
+
+
+async def _read_capped(stream):
+    data = bytearray()
+    truncated = False
+    # Keep draining past the cap so the child never blocks on a full pipe
+    while chunk := await stream.read(65536):
+        remaining = MAX_OUTPUT_SIZE - len(data)
+        if len(chunk) > remaining:
+            truncated = True
+        if remaining > 0:
+            data += chunk[:remaining]
+    text = data.decode(errors="replace")
+    return text + TRUNCATED_MARKER if truncated else text
+
+
+async def _run_process(*args):
+    """Run a command with capped output, killing it on timeout or cancellation."""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr, _ = await asyncio.wait_for(
+            asyncio.gather(_read_capped(proc.stdout), _read_capped(proc.stderr), proc.wait()),
+            timeout=EXECUTION_TIMEOUT,
+        )
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        proc.kill()
+        await proc.wait()
+        raise
+    return stdout, stderr
+
+
+async def run_code(code, language):
+    start_time = datetime.now()
+    
+    # Simple execution logic (MVP - NOT SANDBOXED)
+    # WARNING: This allows arbitrary code execution.
+    # For production, use a secure sandbox like execution-engine or Docker-in-Docker.
+    
+    output = ""
+    error = ""
+    
+    try:
+        if language == "python":
+            # Run python code in a separate process
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+                f.write(code)
+                f_path = f.name
+            
+            try:
+                output, error = await _run_process("python", f_path)
+            except asyncio.TimeoutError:
+                error = f"Execution timed out ({EXECUTION_TIMEOUT:g}s limit)"
+            finally:
+                if os.path.exists(f_path):
+                    os.unlink(f_path)
+                    
+        elif language == "javascript":
+            # Run JS using node
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
+                f.write(code)
+                f_path = f.name
+                
+            try:
+                output, error = await _run_process("node", f_path)
+            except asyncio.TimeoutError:
+                error = f"Execution timed out ({EXECUTION_TIMEOUT:g}s limit)"
+            except FileNotFoundError:
+                error = "Node.js not found in backend container"
+            finally:
+                if os.path.exists(f_path):
+                    os.unlink(f_path)
+        else:
+            return {"error": "Unsupported language", "executionTime": 0}
+
+    except Exception as e:
+        error = str(e)
+
+    execution_time = (datetime.now() - start_time).total_seconds() * 1000
+    
+    return {
+        "output": output,
+        "error": error,
+        "executionTime": execution_time
+    }
+
+
+class RoomExecutions:
+    """
+    Runs a room's code on the server, one execution per room revision.
+    Concurrent requests for the same room, language and code share a single
+    run, and `on_result` (the room broadcast) is called once per run.
+    """
+
+    def __init__(self, max_rooms=LAST_RESULT_ROOMS):
+        self.max_rooms = max_rooms
+        self._inflight = {}
+        self._last_results = OrderedDict()
+        # room_id -> [generation, runs in flight]; only tracked while runs are in flight
+        self._generations = {}
+
+    def last_result(self, room_id):
+        return self._last_results.get(room_id)
+
+    def record(self, room_id, result):
+        """Keep `result` as the room's latest, dropping the least recently run rooms."""
+        self._last_results[room_id] = result
+        self._last_results.move_to_end(room_id)
+        while len(self._last_results) > self.max_rooms:
+            self._last_results.popitem(last=False)
+
+    def clear(self, room_id):
+        """Forget the room's last result; runs already in flight won't record theirs."""
+        self._last_results.pop(room_id, None)
+        if room_id in self._generations:
+            self._generations[room_id][0] += 1
+
+    async def run(self, room_id, code, language, on_result):
+        key = (room_id, language, code)
+        task = self._inflight.get(key)
+        if task is None:
+            tracked = self._generations.setdefault(room_id, [0, 0])
+            tracked[1] += 1
+            task = asyncio.get_running_loop().create_task(
+                self._execute(key, room_id, code, language, on_result, tracked[0])
+            )
+            self._inflight[key] = task
+        # Shield so a client disconnecting doesn't cancel the run for everyone else
+        return await asyncio.shield(task)
+
+    async def _execute(self, key, room_id, code, language, on_result, generation):
+        try:
+            result = await run_code(code, language)
+            # Skip if the room was cleared (e.g. language changed) while running
+            if self._generations[room_id][0] == generation:
+                self.record(room_id, result)
+                await on_result(room_id, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            tracked = self._generations[room_id]
+            tracked[1] -= 1
+            if tracked[1] == 0:
+                del self._generations[room_id]
+
+
+room_executions = RoomExecutions()
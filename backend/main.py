@@ -2,28 +2,37 @@ import socketio
 import uvicorn
 import os
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Depends
+import secrets
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from uuid import uuid4
+from typing import Optional
 from datetime import datetime
 from models import *
 from db_models import DBRoom, DBUser
 from database import get_db, engine, Base, SessionLocal
+from room_updates import room_updates
+from execution import run_code, room_executions, truncate_output
+from monitoring import LoopLagMonitor, SlowRequestMiddleware, long_running, timed_handler, profile_event_loop
 
 from contextlib import asynccontextmanager
 
+lag_monitor = LoopLagMonitor()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Create tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    lag_monitor.start()
     yield
-    # Shutdown: (Optional cleanup if needed)
+    # Shutdown
+    await lag_monitor.stop()
 
 # Initialize Socket.IO server
 sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
@@ -40,6 +49,8 @@ fastapi_app.add_middleware(
     allow_headers=["*"],
 )
 
+fastapi_app.add_middleware(SlowRequestMiddleware)
+
 # Constants
 DEFAULT_JS_CODE = '// Start coding...\nconsole.log("Hello");'
 DEFAULT_PY_CODE = '# Start coding...\nprint("Hello")'
@@ -52,11 +63,23 @@ async def api_root():
 async def health_check():
     return {"status": "ok"}
 
+def room_response(room: DBRoom, position) -> Room:
+    # epoch/seq let the client resume from this point on `join-room` without gaps.
+    # `position` must be read before the room is loaded: a newer row only means a
+    # harmless duplicate on replay, while a newer seq would skip an update.
+    data = Room.model_validate(room)
+    data.epoch, data.seq = position
+    last_execution = room_executions.last_result(room.id)
+    if last_execution:
+        data.lastExecution = ExecutionResult.model_validate(last_execution)
+    return data
+
 @fastapi_app.post("/api/rooms", response_model=CreateRoomResponse, status_code=201)
 async def create_room(request: CreateRoomRequest, db: AsyncSession = Depends(get_db)):
     room_id = str(uuid4())[:8]
     user_id = str(uuid4())
     
+    position = room_updates.position(room_id)
     initial_code = DEFAULT_PY_CODE if request.language == Language.python else DEFAULT_JS_CODE
     
     db_room = DBRoom(
@@ -85,10 +108,11 @@ async def create_room(request: CreateRoomRequest, db: AsyncSession = Depends(get
     result = await db.execute(select(DBRoom).options(selectinload(DBRoom.participants)).filter(DBRoom.id == room_id))
     room = result.scalars().first()
     
-    return CreateRoomResponse(room=Room.model_validate(room), user=User.model_validate(db_user))
+    return CreateRoomResponse(room=room_response(room, position), user=User.model_validate(db_user))
 
 @fastapi_app.post("/api/rooms/{room_id}/join", response_model=JoinRoomResponse)
 async def join_room(room_id: str, request: JoinRoomRequest, db: AsyncSession = Depends(get_db)):
+    position = room_updates.position(room_id)
     result = await db.execute(select(DBRoom).options(selectinload(DBRoom.participants)).filter(DBRoom.id == room_id))
     room = result.scalars().first()
     
@@ -108,97 +132,71 @@ async def join_room(room_id: str, request: JoinRoomRequest, db: AsyncSession = D
     await db.refresh(room) # Refresh room to include new participant in the list
     
     # We need to return the created user object, and the updated room
-    return JoinRoomResponse(room=Room.model_validate(room), user=User.model_validate(db_user))
+    return JoinRoomResponse(room=room_response(room, position), user=User.model_validate(db_user))
 
 @fastapi_app.get("/api/rooms/{room_id}", response_model=Room)
 async def get_room(room_id: str, db: AsyncSession = Depends(get_db)):
+    position = room_updates.position(room_id)
     result = await db.execute(select(DBRoom).options(selectinload(DBRoom.participants)).filter(DBRoom.id == room_id))
     room = result.scalars().first()
     
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
-    return Room.model_validate(room)
+    return room_response(room, position)
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 class ExecuteCodeRequest(BaseModel):
     code: str
     language: str
 
-import subprocess
-import tempfile
-import asyncio
-
 @fastapi_app.post("/api/execute")
+@long_running
 async def execute_code_endpoint(request: ExecuteCodeRequest):
-    start_time = datetime.now()
-    
-    # Simple execution logic (MVP - NOT SANDBOXED)
-    # WARNING: This allows arbitrary code execution.
-    # For production, use a secure sandbox like execution-engine or Docker-in-Docker.
-    
-    output = ""
-    error = ""
-    
-    try:
-        if request.language == "python":
-            # Run python code in a separate process
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(request.code)
-                f_path = f.name
-            
-            try:
-                proc = await asyncio.create_subprocess_exec(
-                    "python", f_path,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=5.0)
-                
-                output = stdout.decode() if stdout else ""
-                error = stderr.decode() if stderr else ""
-            except asyncio.TimeoutError:
-                error = "Execution timed out (5s limit)"
-            finally:
-                if os.path.exists(f_path):
-                    os.unlink(f_path)
-                    
-        elif request.language == "javascript":
-            # Run JS using node
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
-                f.write(request.code)
-                f_path = f.name
-                
-            try:
-                proc = await asyncio.create_subprocess_exec(
-                    "node", f_path,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=5.0)
-                
-                output = stdout.decode() if stdout else ""
-                error = stderr.decode() if stderr else ""
-            except asyncio.TimeoutError:
-                error = "Execution timed out (5s limit)"
-            except FileNotFoundError:
-                error = "Node.js not found in backend container"
-            finally:
-                if os.path.exists(f_path):
-                    os.unlink(f_path)
-        else:
-            return {"error": "Unsupported language", "executionTime": 0}
-
-    except Exception as e:
-        error = str(e)
-
-    execution_time = (datetime.now() - start_time).total_seconds() * 1000
-    
-    return {
-        "output": output,
-        "error": error,
-        "executionTime": execution_time
-    }
+    return await run_code(request.code, request.language)
+
+async def broadcast_execution_result(room_id, result):
+    await sio.emit("execution-result", {"result": result}, room=room_id)
+
+@fastapi_app.post("/api/rooms/{room_id}/execute", response_model=ExecutionResult)
+@long_running
+async def execute_room(room_id: str, request: Optional[ExecuteRoomRequest] = None, db: AsyncSession = Depends(get_db)):
+    # Runs the room's saved code and broadcasts the result to everyone in the room.
+    # Updates are appended only after they commit, so if the log has reached the
+    # client's seq, the row read below includes the client's code.
+    epoch, seq = room_updates.position(room_id)
+    if request and request.seq is not None and request.epoch == epoch and request.seq > seq:
+        raise HTTPException(status_code=409, detail="Room code is older than the requested revision")
+
+    result = await db.execute(select(DBRoom).filter(DBRoom.id == room_id))
+    room = result.scalars().first()
+
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    code, language = room.code, room.language
+    # Release the pooled connection rather than holding it for the whole run
+    await db.close()
+    return await room_executions.run(room_id, code, language, broadcast_execution_result)
+
+# Admin diagnostics (disabled unless ADMIN_TOKEN is set)
+def require_admin(x_admin_token: str = Header(default="")):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secrets.compare_digest(x_admin_token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@fastapi_app.get("/api/admin/loop-lag", dependencies=[Depends(require_admin)])
+async def loop_lag_stats():
+    return lag_monitor.stats()
+
+@fastapi_app.get("/api/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+@long_running
+async def profile(seconds: float = 5.0, interval_ms: float = 5.0):
+    # Returns collapsed stacks, e.g. `flamegraph.pl profile.txt > profile.svg`
+    if seconds <= 0 or interval_ms <= 0:
+        raise HTTPException(status_code=400, detail="seconds and interval_ms must be positive")
+    return await profile_event_loop(seconds, interval_ms)
 
 # Socket.IO Events
 @sio.event
@@ -212,11 +210,38 @@ async def disconnect(sid):
     pass
 
 @sio.on("join-room")
-async def handle_join_room(sid, room_id):
+@timed_handler("join-room")
+async def handle_join_room(sid, data):
+    # Accepts a bare room id, or {"roomId", "epoch", "lastSeq"} to catch up after a reconnect
+    if not isinstance(data, dict):
+        await sio.enter_room(sid, data)
+        return
+
+    room_id = data.get("roomId")
+    epoch = data.get("epoch")
+    last_seq = data.get("lastSeq")
     # Just socket join, verification could be added
     await sio.enter_room(sid, room_id)
 
+    missed = None
+    if isinstance(last_seq, int) and not isinstance(last_seq, bool):
+        missed = room_updates.since(room_id, epoch, last_seq)
+    if missed is not None:
+        for event, payload in missed:
+            await sio.emit(event, payload, to=sid)
+        return
+
+    # Unknown epoch or invalid lastSeq - send the current state instead
+    epoch, seq = room_updates.position(room_id)
+    async with SessionLocal() as db:
+        result = await db.execute(select(DBRoom).filter(DBRoom.id == room_id))
+        room = result.scalars().first()
+        if room:
+            snapshot = {"code": room.code, "language": room.language, "seq": seq, "epoch": epoch}
+            await sio.emit("room-snapshot", snapshot, to=sid)
+
 @sio.on("code-update")
+@timed_handler("code-update")
 async def handle_code_update(sid, data):
     room_id = data.get("roomId")
     code = data.get("code")
@@ -227,15 +252,20 @@ async def handle_code_update(sid, data):
         if room:
             room.code = code
             await db.commit()
-            await sio.emit("code-update", {"code": code}, room=room_id, skip_sid=sid)
+            update = room_updates.append(room_id, "code-update", {"code": code})
+            await sio.emit("code-update", update, room=room_id, skip_sid=sid)
+            # Ack to the sender so it can track the sequence it has already seen
+            return {"seq": update["seq"], "epoch": update["epoch"]}
 
 @sio.on("cursor-update")
+@timed_handler("cursor-update")
 async def handle_cursor_update(sid, data):
     room_id = data.get("roomId")
     # Broadcast to room except sender
     await sio.emit("cursor-update", data, room=room_id, skip_sid=sid)
 
 @sio.on("language-update")
+@timed_handler("language-update")
 async def handle_language_update(sid, data):
     room_id = data.get("roomId")
     language = data.get("language")
@@ -246,12 +276,26 @@ async def handle_language_update(sid, data):
         if room:
             room.language = language
             await db.commit()
-            await sio.emit("language-update", {"language": language}, room=room_id, skip_sid=sid)
+            # The last result belongs to the previous language
+            room_executions.clear(room_id)
+            update = room_updates.append(room_id, "language-update", {"language": language})
+            await sio.emit("language-update", update, room=room_id, skip_sid=sid)
+            # Ack to the sender so it can track the sequence it has already seen
+            return {"seq": update["seq"], "epoch": update["epoch"]}
 
 @sio.on("execution-result")
+@timed_handler("execution-result")
 async def handle_execution_result(sid, data):
     room_id = data.get("roomId")
-    result = data.get("result")
+    # Relayed from a browser run (JavaScript); only pass on a well-formed, size-capped result
+    try:
+        result = ExecutionResult.model_validate(data.get("result"))
+    except ValidationError:
+        return
+    result.output = truncate_output(result.output)
+    result.error = truncate_output(result.error)
+    result = result.model_dump()
+    room_executions.record(room_id, result)
     await sio.emit("execution-result", {"result": result}, room=room_id, skip_sid=sid)
 
 # Check if static directory exists (for production deployments)
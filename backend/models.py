@@ -20,6 +20,11 @@ class User(BaseModel):
     cursorPosition: Optional[CursorPosition] = None
     model_config = ConfigDict(from_attributes=True)
 
+class ExecutionResult(BaseModel):
+    output: str = ""
+    error: str = ""
+    executionTime: float
+
 class Room(BaseModel):
     id: str
     code: str
@@ -27,6 +32,9 @@ class Room(BaseModel):
     participants: List[User]
     createdAt: datetime
     hostId: str
+    epoch: Optional[str] = None
+    seq: int = 0
+    lastExecution: Optional[ExecutionResult] = None
     model_config = ConfigDict(from_attributes=True)
 
 class CreateRoomRequest(BaseModel):
@@ -40,6 +48,12 @@ class CreateRoomResponse(BaseModel):
 class JoinRoomRequest(BaseModel):
     userName: str
 
+class ExecuteRoomRequest(BaseModel):
+    # Room position at which the client's latest code was acked; the server
+    # answers 409 rather than run older code. Omit to run whatever is saved.
+    epoch: Optional[str] = None
+    seq: Optional[int] = None
+
 class JoinRoomResponse(BaseModel):
     room: Room
     user: User
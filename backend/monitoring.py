@@ -0,0 +1,172 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger("code_collab_hub.monitoring")
+
+# Handler wall time (including awaited I/O) above this is logged as slow,
+# and event loop scheduling delay above it is logged as lag
+SLOW_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+# How often the lag monitor wakes up to measure scheduling delay
+LAG_CHECK_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL_MS", "500")) / 1000
+
+# Sampling profiler limits
+PROFILE_MAX_SECONDS = 60.0
+PROFILE_DEFAULT_INTERVAL_MS = 5.0
+# Sampling faster than this starves the event loop of the GIL
+PROFILE_MIN_INTERVAL_MS = 1.0
+
+
+def _extract_room_id(args):
+    """Best-effort room id lookup from Socket.IO handler arguments (sid, data)."""
+    if len(args) < 2:
+        return None
+    data = args[1]
+    if isinstance(data, dict):
+        return data.get("roomId")
+    if isinstance(data, str):
+        return data
+    return None
+
+
+def log_slow(kind, name, elapsed_ms, room_id=None):
+    if elapsed_ms < SLOW_THRESHOLD_MS:
+        return
+    logger.warning(
+        "Slow %s %s: wall time %.1fms (room=%s, threshold=%.0fms)",
+        kind, name, elapsed_ms, room_id or "-", SLOW_THRESHOLD_MS,
+    )
+
+
+def long_running(func):
+    """Mark an endpoint whose wall time is expected to be long, so it isn't logged as slow."""
+    func.long_running = True
+    return func
+
+
+class SlowRequestMiddleware:
+    """ASGI middleware that logs HTTP requests whose handler wall time exceeds the threshold."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            # The router fills in endpoint and path_params on the shared scope
+            endpoint = scope.get("endpoint")
+            if not getattr(endpoint, "long_running", False):
+                name = endpoint.__name__ if endpoint else scope["path"]
+                room_id = scope.get("path_params", {}).get("room_id")
+                log_slow("request", f"{scope['method']} {name}", elapsed_ms, room_id)
+
+
+def timed_handler(event):
+    """Decorator for Socket.IO handlers that logs calls whose wall time exceeds the threshold."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return await func(*args)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                log_slow("socket handler", event, elapsed_ms, _extract_room_id(args))
+        return wrapper
+    return decorator
+
+
+class LoopLagMonitor:
+    """
+    Periodically measures how late the event loop wakes a sleeping task.
+    A large delay means some callback held the loop for that long.
+    """
+
+    def __init__(self, interval=LAG_CHECK_INTERVAL, threshold_ms=SLOW_THRESHOLD_MS):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.max_lag_ms = 0.0
+        self.last_lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms >= self.threshold_ms:
+                logger.warning("Event loop lag %.1fms (threshold=%.0fms)", lag_ms, self.threshold_ms)
+
+    def stats(self):
+        return {
+            "lastLagMs": round(self.last_lag_ms, 3),
+            "maxLagMs": round(self.max_lag_ms, 3),
+            "thresholdMs": self.threshold_ms,
+        }
+
+
+def _collapse_frame(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def sample_stacks(thread_id, seconds, interval_ms=PROFILE_DEFAULT_INTERVAL_MS):
+    """
+    Sample the stack of `thread_id` every `interval_ms` for `seconds`.
+    Blocking - run it off the event loop. Returns a Counter of collapsed stacks.
+    """
+    interval = interval_ms / 1000
+    deadline = time.monotonic() + seconds
+    samples = Counter()
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            samples[_collapse_frame(frame)] += 1
+        del frame
+        time.sleep(interval)
+    return samples
+
+
+def format_collapsed(samples):
+    """Render samples in Brendan Gregg's collapsed format (`a;b;c count`)."""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+async def profile_event_loop(seconds, interval_ms=PROFILE_DEFAULT_INTERVAL_MS):
+    """Profile the thread running the current event loop without blocking it."""
+    loop_thread_id = threading.get_ident()
+    seconds = min(max(seconds, 0.0), PROFILE_MAX_SECONDS)
+    interval_ms = max(interval_ms, PROFILE_MIN_INTERVAL_MS)
+    samples = await asyncio.to_thread(sample_stacks, loop_thread_id, seconds, interval_ms)
+    return format_collapsed(samples)
@@ -0,0 +1,71 @@
+import os
+from collections import OrderedDict
+from uuid import uuid4
+
+# Number of rooms with a log kept in memory; least recently used are dropped
+UPDATE_LOG_ROOMS = int(os.getenv("ROOM_UPDATE_LOG_ROOMS", "1000"))
+
+
+class _RoomLog:
+    __slots__ = ("epoch", "seq", "latest")
+
+    def __init__(self):
+        # A new epoch whenever the log is (re)created, e.g. after a restart or
+        # eviction, so sequences from an older log are never compared with it
+        self.epoch = uuid4().hex[:8]
+        self.seq = 0
+        # event -> latest stamped payload; each update carries full state
+        self.latest = {}
+
+
+class RoomUpdateLog:
+    """
+    In-memory, per-room log of broadcast updates.
+    Every update gets the next sequence number for its room. Updates carry
+    the full state for their event (the whole document, the language), so
+    only the newest update per event is kept - enough to bring any client
+    in the same epoch up to date. Only the `max_rooms` most recently used
+    rooms are kept. Not shared between processes.
+    """
+
+    def __init__(self, max_rooms=UPDATE_LOG_ROOMS):
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()
+
+    def _room(self, room_id):
+        room = self._rooms.get(room_id)
+        if room is None:
+            room = self._rooms[room_id] = _RoomLog()
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(room_id)
+        return room
+
+    def position(self, room_id):
+        """Current (epoch, seq) of a room, for clients to resume from."""
+        room = self._room(room_id)
+        return room.epoch, room.seq
+
+    def append(self, room_id, event, payload):
+        """Record an update and return the payload stamped with its epoch and sequence number."""
+        room = self._room(room_id)
+        room.seq += 1
+        stamped = {**payload, "seq": room.seq, "epoch": room.epoch}
+        room.latest[event] = stamped
+        return stamped
+
+    def since(self, room_id, epoch, last_seq):
+        """
+        Latest update of each event changed after `last_seq` as (event, payload)
+        pairs, oldest first. Returns None when they can't be replayed (different
+        epoch, or a sequence never issued) - send a snapshot instead.
+        """
+        room = self._room(room_id)
+        if epoch != room.epoch or last_seq > room.seq:
+            return None
+        missed = [(event, payload) for event, payload in room.latest.items() if payload["seq"] > last_seq]
+        return sorted(missed, key=lambda update: update[1]["seq"])
+
+
+room_updates = RoomUpdateLog()
@@ -18,6 +18,9 @@ def test_create_room():
     assert data["user"]["name"] == "Alice"
     assert data["room"]["language"] == "python"
     assert data["room"]["code"].startswith("# Start")
+    # The host resumes from this position on its first join-room
+    assert data["room"]["epoch"]
+    assert data["room"]["seq"] == 0
 
 def test_join_room():
     # First create a room
@@ -42,6 +45,7 @@ def test_get_room():
     response = client.get(f"/api/rooms/{room_id}")
     assert response.status_code == 200
     assert response.json()["id"] == room_id
+    assert response.json()["seq"] == 0
 
 def test_get_nonexistent_room():
     response = client.get("/api/rooms/nonexistent")
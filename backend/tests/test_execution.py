@@ -0,0 +1,153 @@
+from fastapi.testclient import TestClient
+import asyncio
+import sys
+import os
+
+# Add parent directory to path to import main
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import execution
+from execution import RoomExecutions
+
+client = TestClient(main.fastapi_app)
+
+async def test_concurrent_runs_share_one_execution(monkeypatch):
+    calls = []
+    async def fake_run_code(code, language):
+        calls.append(code)
+        await asyncio.sleep(0.05)
+        return {"output": code, "error": "", "executionTime": 1}
+    monkeypatch.setattr(execution, "run_code", fake_run_code)
+
+    broadcasts = []
+    async def on_result(room_id, result):
+        broadcasts.append((room_id, result))
+
+    executions = RoomExecutions()
+    results = await asyncio.gather(*[
+        executions.run("room1", "print(1)", "python", on_result) for _ in range(3)
+    ])
+    assert calls == ["print(1)"]
+    assert broadcasts == [("room1", results[0])]
+    assert all(r == results[0] for r in results)
+    assert executions.last_result("room1") == results[0]
+
+    # A new revision runs again once the previous run has finished
+    await executions.run("room1", "print(2)", "python", on_result)
+    assert calls == ["print(1)", "print(2)"]
+
+def test_execute_room_runs_saved_code_and_keeps_result(monkeypatch):
+    broadcasts = []
+    async def fake_broadcast(room_id, result):
+        broadcasts.append(room_id)
+    monkeypatch.setattr(main, "broadcast_execution_result", fake_broadcast)
+    monkeypatch.setattr(main, "room_executions", RoomExecutions())
+
+    create_resp = client.post("/api/rooms", json={"hostName": "Erin", "language": "python"})
+    room_id = create_resp.json()["room"]["id"]
+    assert create_resp.json()["room"]["lastExecution"] is None
+
+    response = client.post(f"/api/rooms/{room_id}/execute")
+    assert response.status_code == 200
+    assert response.json()["output"].strip() == "Hello"
+    assert broadcasts == [room_id]
+
+    room = client.get(f"/api/rooms/{room_id}").json()
+    assert room["lastExecution"] == response.json()
+
+async def test_timed_out_run_kills_process(monkeypatch, tmp_path):
+    monkeypatch.setattr(execution, "EXECUTION_TIMEOUT", 0.5)
+    pid_file = tmp_path / "pid"
+    code = f"import os\nopen({str(pid_file)!r}, 'w').write(str(os.getpid()))\nwhile True: pass\n"
+
+    result = await execution.run_code(code, "python")
+    assert result["error"] == "Execution timed out (0.5s limit)"
+    pid = int(pid_file.read_text())
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        pass
+    else:
+        raise AssertionError(f"process {pid} still running")
+
+async def test_run_output_is_capped(monkeypatch):
+    monkeypatch.setattr(execution, "MAX_OUTPUT_SIZE", 100)
+    result = await execution.run_code("print('x' * 100000)", "python")
+    assert result["output"] == "x" * 100 + execution.TRUNCATED_MARKER
+
+def test_last_results_evict_least_recently_run_rooms():
+    executions = RoomExecutions(max_rooms=2)
+    for room_id in ["a", "b", "c"]:
+        executions.record(room_id, {"output": room_id, "error": "", "executionTime": 1})
+    assert executions.last_result("a") is None
+    assert executions.last_result("c")["output"] == "c"
+    executions.clear("c")
+    assert executions.last_result("c") is None
+
+async def test_relayed_result_is_validated_capped_and_recorded(monkeypatch):
+    executions = RoomExecutions()
+    monkeypatch.setattr(main, "room_executions", executions)
+    monkeypatch.setattr(execution, "MAX_OUTPUT_SIZE", 10)
+    emitted = []
+    async def fake_emit(event, data, **kwargs):
+        emitted.append((event, data))
+    monkeypatch.setattr(main.sio, "emit", fake_emit)
+
+    await main.handle_execution_result("sid1", {"roomId": "room1", "result": "not a result"})
+    assert emitted == []
+    assert executions.last_result("room1") is None
+
+    await main.handle_execution_result("sid1", {"roomId": "room1", "result": {"output": "y" * 50, "executionTime": 2}})
+    expected = {"output": "y" * 10 + execution.TRUNCATED_MARKER, "error": "", "executionTime": 2}
+    assert emitted == [("execution-result", {"result": expected})]
+    assert executions.last_result("room1") == expected
+
+async def test_clear_during_run_skips_recording_stale_result(monkeypatch):
+    started = asyncio.Event()
+    release = asyncio.Event()
+    async def fake_run_code(code, language):
+        started.set()
+        await release.wait()
+        return {"output": "old", "error": "", "executionTime": 1}
+    monkeypatch.setattr(execution, "run_code", fake_run_code)
+    broadcasts = []
+    async def on_result(room_id, result):
+        broadcasts.append(result)
+
+    executions = RoomExecutions()
+    run = asyncio.ensure_future(executions.run("room1", "print(1)", "python", on_result))
+    await started.wait()
+    # Language changed while the python run was in flight
+    executions.clear("room1")
+    release.set()
+    assert (await run)["output"] == "old"
+    assert executions.last_result("room1") is None
+    assert broadcasts == []
+
+    # Generation tracking is dropped once nothing is in flight; later runs record again
+    await executions.run("room1", "print(2)", "python", on_result)
+    assert executions.last_result("room1")["output"] == "old"
+
+def test_execute_room_rejects_revision_not_yet_saved(monkeypatch):
+    from room_updates import RoomUpdateLog
+    monkeypatch.setattr(main, "room_updates", RoomUpdateLog())
+    monkeypatch.setattr(main, "room_executions", RoomExecutions())
+    async def fake_broadcast(room_id, result):
+        pass
+    monkeypatch.setattr(main, "broadcast_execution_result", fake_broadcast)
+
+    room = client.post("/api/rooms", json={"hostName": "Finn", "language": "python"}).json()["room"]
+    # The client's code-update with seq 1 hasn't been committed yet
+    ahead = client.post(f"/api/rooms/{room['id']}/execute", json={"epoch": room["epoch"], "seq": 1})
+    assert ahead.status_code == 409
+
+    current = client.post(f"/api/rooms/{room['id']}/execute", json={"epoch": room["epoch"], "seq": 0})
+    assert current.status_code == 200
+    # Unknown epoch can't be compared; run what is saved
+    other = client.post(f"/api/rooms/{room['id']}/execute", json={"epoch": "other", "seq": 5})
+    assert other.status_code == 200
+
+def test_execute_nonexistent_room():
+    response = client.post("/api/rooms/nonexistent/execute")
+    assert response.status_code == 404
@@ -0,0 +1,100 @@
+from fastapi.testclient import TestClient
+import asyncio
+import logging
+import sys
+import os
+import threading
+import time
+
+# Add parent directory to path to import main
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import fastapi_app
+from monitoring import LoopLagMonitor, timed_handler, sample_stacks, format_collapsed
+
+client = TestClient(fastapi_app)
+
+def test_admin_endpoints_disabled_without_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    response = client.get("/api/admin/profile", headers={"X-Admin-Token": "anything"})
+    assert response.status_code == 404
+
+def test_admin_endpoints_reject_wrong_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = client.get("/api/admin/loop-lag", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+
+def test_admin_endpoints_reject_non_ascii_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = client.get("/api/admin/loop-lag", headers={"X-Admin-Token": "caf\xe9".encode("latin-1")})
+    assert response.status_code == 403
+
+def test_slow_requests_are_logged_except_long_running(monkeypatch, caplog):
+    import monitoring
+    monkeypatch.setattr(monitoring, "SLOW_THRESHOLD_MS", 0)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    with caplog.at_level(logging.WARNING, logger="code_collab_hub.monitoring"):
+        client.get("/api/admin/loop-lag", headers={"X-Admin-Token": "secret"})
+        client.get("/api/admin/profile", params={"seconds": 0.01}, headers={"X-Admin-Token": "secret"})
+    assert "GET loop_lag_stats" in caplog.text
+    assert "profile" not in caplog.text
+
+def test_profile_returns_collapsed_stacks(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = client.get(
+        "/api/admin/profile",
+        params={"seconds": 0.2, "interval_ms": 1},
+        headers={"X-Admin-Token": "secret"},
+    )
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert ";" in stack
+    assert int(count) > 0
+
+def test_sample_stacks_sees_busy_function():
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            pass
+
+    worker = threading.Thread(target=busy_worker)
+    worker.start()
+    try:
+        samples = sample_stacks(worker.ident, 0.1, interval_ms=1)
+    finally:
+        stop.set()
+        worker.join()
+    assert "busy_worker" in format_collapsed(samples)
+
+async def test_timed_handler_logs_slow_call_with_room(caplog):
+    @timed_handler("code-update")
+    async def handler(sid, data):
+        time.sleep(0.15)
+
+    with caplog.at_level(logging.WARNING, logger="code_collab_hub.monitoring"):
+        await handler("sid", {"roomId": "room123"})
+    assert "code-update" in caplog.text
+    assert "room=room123" in caplog.text
+
+async def test_loop_lag_monitor_detects_blocking():
+    monitor = LoopLagMonitor(interval=0.01, threshold_ms=50)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+    assert monitor.max_lag_ms >= 50
+
+async def test_profile_clamps_sampling_interval(monkeypatch):
+    import monitoring
+    seen = {}
+    def fake_sample_stacks(thread_id, seconds, interval_ms):
+        seen["interval_ms"] = interval_ms
+        return {}
+    monkeypatch.setattr(monitoring, "sample_stacks", fake_sample_stacks)
+    monkeypatch.setattr(monitoring, "format_collapsed", lambda samples: "")
+    await monitoring.profile_event_loop(1, interval_ms=0.001)
+    assert seen["interval_ms"] == monitoring.PROFILE_MIN_INTERVAL_MS
@@ -0,0 +1,96 @@
+import sys
+import os
+
+# Add parent directory to path to import main
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import main
+from db_models import DBRoom
+from models import Language
+from room_updates import RoomUpdateLog
+
+def test_append_stamps_sequential_seq_per_room():
+    log = RoomUpdateLog()
+    epoch, _ = log.position("a")
+    assert log.append("a", "code-update", {"code": "x"}) == {"code": "x", "seq": 1, "epoch": epoch}
+    assert log.append("a", "language-update", {"language": "python"})["seq"] == 2
+    assert log.append("b", "code-update", {"code": "y"})["seq"] == 1
+    assert log.position("a") == (epoch, 2)
+    assert log.position("missing")[1] == 0
+
+def test_since_returns_latest_missed_update_per_event():
+    log = RoomUpdateLog()
+    epoch = log.append("a", "language-update", {"language": "python"})["epoch"]
+    for i in range(5):
+        log.append("a", "code-update", {"code": str(i)})
+    # Only the newest full document is replayed, not every intermediate one
+    assert log.since("a", epoch, 3) == [("code-update", {"code": "4", "seq": 6, "epoch": epoch})]
+    assert [event for event, _ in log.since("a", epoch, 0)] == ["language-update", "code-update"]
+    assert log.since("a", epoch, 6) == []
+    assert log.since("a", epoch, 99) is None
+
+def test_since_requires_snapshot_for_other_epoch():
+    # Same room after a restart: the new log may already be past the client's seq
+    old_epoch, _ = RoomUpdateLog().position("a")
+    log = RoomUpdateLog()
+    for i in range(6):
+        log.append("a", "code-update", {"code": str(i)})
+    assert log.since("a", old_epoch, 5) is None
+    assert log.since("a", None, 5) is None
+
+def test_least_recently_used_rooms_are_evicted():
+    log = RoomUpdateLog(max_rooms=2)
+    epoch_a = log.append("a", "code-update", {"code": "a"})["epoch"]
+    log.append("b", "code-update", {"code": "b"})
+    log.append("a", "code-update", {"code": "a2"})
+    log.append("c", "code-update", {"code": "c"})
+    # "b" was least recently used
+    assert log.position("a") == (epoch_a, 2)
+    assert log.since("c", log.position("c")[0], 0) is not None
+    assert log.position("b")[1] == 0
+
+def _capture_socket(monkeypatch):
+    emitted = []
+    async def fake_enter_room(sid, room):
+        pass
+    async def fake_emit(event, data, **kwargs):
+        emitted.append((event, data, kwargs))
+    monkeypatch.setattr(main.sio, "enter_room", fake_enter_room)
+    monkeypatch.setattr(main.sio, "emit", fake_emit)
+    return emitted
+
+async def test_join_room_replays_missed_updates(monkeypatch):
+    log = RoomUpdateLog()
+    monkeypatch.setattr(main, "room_updates", log)
+    epoch = log.append("room1", "code-update", {"code": "one"})["epoch"]
+    log.append("room1", "language-update", {"language": "python"})
+    emitted = _capture_socket(monkeypatch)
+
+    await main.handle_join_room("sid1", {"roomId": "room1", "epoch": epoch, "lastSeq": 1})
+    assert emitted == [("language-update", {"language": "python", "seq": 2, "epoch": epoch}, {"to": "sid1"})]
+
+    emitted.clear()
+    await main.handle_join_room("sid1", "room1")
+    assert emitted == []
+
+async def test_join_room_with_invalid_last_seq_sends_snapshot(monkeypatch, test_engine):
+    log = RoomUpdateLog()
+    monkeypatch.setattr(main, "room_updates", log)
+    TestSessionLocal = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(main, "SessionLocal", TestSessionLocal)
+    async with TestSessionLocal() as db:
+        db.add(DBRoom(id="room1", code="print(1)", language=Language.python, hostId="host"))
+        await db.commit()
+    epoch = log.append("room1", "code-update", {"code": "print(1)"})["epoch"]
+    emitted = _capture_socket(monkeypatch)
+
+    for last_seq in ["1", True, None]:
+        emitted.clear()
+        await main.handle_join_room("sid1", {"roomId": "room1", "epoch": epoch, "lastSeq": last_seq})
+        assert emitted == [(
+            "room-snapshot",
+            {"code": "print(1)", "language": Language.python, "seq": 1, "epoch": epoch},
+            {"to": "sid1"},
+        )]
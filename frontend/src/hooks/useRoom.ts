@@ -34,7 +34,9 @@ export function useRoom({ initialState }: UseRoomProps = {}): UseRoomReturn {
   const [currentUser, setCurrentUser] = useState<User | null>(initialState?.currentUser || null);
   const [isConnected, setIsConnected] = useState(false);
   const [isExecuting, setIsExecuting] = useState(false);
-  const [executionResult, setExecutionResult] = useState<CodeExecutionResult | null>(null);
+  const [executionResult, setExecutionResult] = useState<CodeExecutionResult | null>(
+    initialState?.room?.lastExecution ?? null
+  );
   const [isLoading, setIsLoading] = useState(false);
 
   const navigate = useNavigate();
@@ -59,7 +61,7 @@ export function useRoom({ initialState }: UseRoomProps = {}): UseRoomReturn {
   useEffect(() => {
     const connect = async () => {
       if (initialState?.room && initialState?.currentUser && !isConnected) {
-        await websocket.connect(initialState.room.id, initialState.currentUser.id);
+        await websocket.connect(initialState.room.id, initialState.currentUser.id, initialState.room);
         setIsConnected(true);
       }
     };
@@ -110,8 +112,9 @@ export function useRoom({ initialState }: UseRoomProps = {}): UseRoomReturn {
         const { room: newRoom, user } = await api.createRoom({ hostName, language });
         setRoom(newRoom);
         setCurrentUser(user);
+        setExecutionResult(newRoom.lastExecution ?? null);
 
-        await websocket.connect(newRoom.id, user.id);
+        await websocket.connect(newRoom.id, user.id, newRoom);
         setIsConnected(true);
 
         navigate(`/room/${newRoom.id}`);
@@ -140,8 +143,9 @@ export function useRoom({ initialState }: UseRoomProps = {}): UseRoomReturn {
         const { room: joinedRoom, user } = await api.joinRoom({ roomId, userName });
         setRoom(joinedRoom);
         setCurrentUser(user);
+        setExecutionResult(joinedRoom.lastExecution ?? null);
 
-        await websocket.connect(joinedRoom.id, user.id);
+        await websocket.connect(joinedRoom.id, user.id, joinedRoom);
         setIsConnected(true);
 
         toast({
@@ -207,10 +211,19 @@ export function useRoom({ initialState }: UseRoomProps = {}): UseRoomReturn {
 
     setIsExecuting(true);
     try {
-      const result = await executeCode(room.code, room.language);
-      console.log('Execution Result:', result);
-      setExecutionResult(result);
-      websocket.sendExecutionResult(result);
+      if (room.language === 'python') {
+        // Runs server-side; the backend broadcasts the result to the room.
+        // Wait for our edits to be saved so the server doesn't run older code.
+        const position = await websocket.waitForCodeSync();
+        const result = await api.executeRoom(room.id, position);
+        setExecutionResult(result);
+      } else {
+        // JavaScript runs in the browser (the backend image has no Node.js), so relay the result
+        const result = await executeCode(room.code, room.language);
+        console.log('Execution Result:', result);
+        setExecutionResult(result);
+        websocket.sendExecutionResult(result);
+      }
     } catch (error) {
       setExecutionResult({
         output: '',
@@ -6,6 +6,7 @@ import type {
   CreateRoomResponse,
   JoinRoomRequest,
   JoinRoomResponse,
+  CodeExecutionResult,
 } from './types';
 
 const API_URL = '/api';
@@ -55,6 +56,23 @@ export const api = {
     }
   },
 
+  /**
+   * Run the room's saved code on the server. The result is also broadcast to
+   * everyone in the room, and concurrent runs of the same code share one execution.
+   * @param position - Room epoch/seq that includes the caller's latest code update
+   */
+  async executeRoom(roomId: string, position?: Pick<Room, 'epoch' | 'seq'>): Promise<CodeExecutionResult> {
+    const response = await fetch(`${API_URL}/rooms/${roomId}/execute`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(position ?? {}),
+    });
+
+    if (response.status === 409) throw new Error('Your latest changes are still saving, try again');
+    if (!response.ok) throw new Error(`Execution failed: ${response.statusText}`);
+    return response.json();
+  },
+
   /**
    * Update room code (Frontend only pushes to websocket mainly, but API exists if needed)
    * The backend currently doesn't have a specific REST endpoint for code update in the snippet provided,
@@ -18,6 +18,9 @@ export interface Room {
   participants: User[];
   createdAt: string;
   hostId: string;
+  epoch: string | null;
+  seq: number;
+  lastExecution?: CodeExecutionResult | null;
 }
 
 export type Language = 'javascript' | 'python';
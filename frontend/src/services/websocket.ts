@@ -1,5 +1,5 @@
 import { io, Socket } from 'socket.io-client';
-import type { WebSocketMessage, CursorPosition, Language, CodeExecutionResult } from './types';
+import type { WebSocketMessage, CursorPosition, Language, CodeExecutionResult, Room } from './types';
 
 type MessageHandler = (message: WebSocketMessage) => void;
 
@@ -12,11 +12,20 @@ class WebSocketService {
   private isConnected = false;
   private roomId: string | null = null;
   private userId: string | null = null;
+  private epoch: string | null = null;
+  private lastSeq: number | null = null;
+  private pendingCodeUpdates = 0;
+  private codeSyncWaiters: Array<() => void> = [];
 
   /**
    * Connect to a room
+   * @param position - Room epoch/seq from the REST response, so no updates are missed while connecting
    */
-  connect(roomId: string, userId: string): Promise<void> {
+  connect(roomId: string, userId: string, position?: Pick<Room, 'epoch' | 'seq'>): Promise<void> {
+    this.epoch = position?.epoch ?? null;
+    this.lastSeq = position?.seq ?? null;
+    this.settleCodeUpdates();
+
     return new Promise((resolve, reject) => {
       // Initialize socket connection
       const API_URL = import.meta.env.VITE_API_URL;
@@ -33,7 +42,8 @@ class WebSocketService {
         this.userId = userId;
         console.log(`[WebSocket] Connected to server, joining room ${roomId}`);
 
-        this.socket?.emit('join-room', roomId);
+        // On reconnect, the server replays updates after lastSeq (or sends a room-snapshot)
+        this.socket?.emit('join-room', { roomId, epoch: this.epoch, lastSeq: this.lastSeq });
         resolve();
       });
 
@@ -43,7 +53,8 @@ class WebSocketService {
       });
 
       // Handle incoming messages
-      this.socket.on('code-update', (data: { code?: string; language?: string }) => {
+      this.socket.on('code-update', (data: { code?: string; language?: string; seq?: number; epoch?: string }) => {
+        this.trackSeq(data);
         this.broadcast({
           type: 'code_update',
           payload: { code: data.code, language: data.language as Language },
@@ -52,7 +63,8 @@ class WebSocketService {
         });
       });
 
-      this.socket.on('language-update', (data: { language: string }) => {
+      this.socket.on('language-update', (data: { language: string; seq?: number; epoch?: string }) => {
+        this.trackSeq(data);
         this.broadcast({
           type: 'code_update',
           payload: { language: data.language as Language },
@@ -61,6 +73,17 @@ class WebSocketService {
         });
       });
 
+      this.socket.on('room-snapshot', (data: { code: string; language: string; seq: number; epoch: string }) => {
+        this.epoch = data.epoch;
+        this.lastSeq = data.seq;
+        this.broadcast({
+          type: 'code_update',
+          payload: { code: data.code, language: data.language as Language },
+          userId: 'server',
+          timestamp: Date.now(),
+        });
+      });
+
       this.socket.on('execution-result', (data: { result: CodeExecutionResult }) => {
         this.broadcast({
           type: 'execution_result',
@@ -92,6 +115,9 @@ class WebSocketService {
     this.isConnected = false;
     this.roomId = null;
     this.userId = null;
+    this.epoch = null;
+    this.lastSeq = null;
+    this.settleCodeUpdates();
   }
 
   /**
@@ -99,7 +125,36 @@ class WebSocketService {
    */
   sendCodeUpdate(code: string): void {
     if (!this.socket || !this.roomId) return;
-    this.socket.emit('code-update', { roomId: this.roomId, code });
+    this.pendingCodeUpdates += 1;
+    this.socket.emit('code-update', { roomId: this.roomId, code }, (ack?: { seq: number; epoch: string }) => {
+      this.trackSeq(ack);
+      this.pendingCodeUpdates -= 1;
+      if (this.pendingCodeUpdates === 0) this.settleCodeUpdates();
+    });
+  }
+
+  /**
+   * Wait until every code update sent so far has been saved by the server,
+   * and return the room position that includes them
+   */
+  waitForCodeSync(timeoutMs = 5000): Promise<Pick<Room, 'epoch' | 'seq'>> {
+    return new Promise((resolve, reject) => {
+      const done = () => resolve({ epoch: this.epoch, seq: this.lastSeq ?? 0 });
+      if (this.pendingCodeUpdates === 0) {
+        done();
+        return;
+      }
+
+      const waiter = () => {
+        clearTimeout(timer);
+        done();
+      };
+      const timer = setTimeout(() => {
+        this.codeSyncWaiters = this.codeSyncWaiters.filter((w) => w !== waiter);
+        reject(new Error('Your latest changes have not reached the server yet'));
+      }, timeoutMs);
+      this.codeSyncWaiters.push(waiter);
+    });
   }
 
   /**
@@ -115,7 +170,9 @@ class WebSocketService {
    */
   sendLanguageChange(language: Language): void {
     if (!this.socket || !this.roomId) return;
-    this.socket.emit('language-update', { roomId: this.roomId, language });
+    this.socket.emit('language-update', { roomId: this.roomId, language }, (ack?: { seq: number; epoch: string }) =>
+      this.trackSeq(ack)
+    );
   }
 
   /**
@@ -134,6 +191,30 @@ class WebSocketService {
     return () => this.handlers.delete(handler);
   }
 
+  /**
+   * Release everyone waiting for code updates to be saved
+   */
+  private settleCodeUpdates(): void {
+    this.pendingCodeUpdates = 0;
+    const waiters = this.codeSyncWaiters;
+    this.codeSyncWaiters = [];
+    waiters.forEach((waiter) => waiter());
+  }
+
+  /**
+   * Remember the highest room sequence seen, for catch-up on reconnect
+   */
+  private trackSeq(update?: { seq?: number; epoch?: string }): void {
+    if (!update || update.seq === undefined) return;
+    if (update.epoch !== this.epoch) {
+      // The server started a new log for this room; sequences restart from here
+      this.epoch = update.epoch ?? null;
+      this.lastSeq = update.seq;
+    } else if (this.lastSeq === null || update.seq > this.lastSeq) {
+      this.lastSeq = update.seq;
+    }
+  }
+
   /**
    * Broadcast message to all handlers
    */